@@ -26,8 +26,7 @@
 #       triangle, square, pentagonal, hexagonal, heptagonal, and octagonal,
 #       is represented by a different number in the set.
 
-from collections import defaultdict
-from math import ceil, floor, sqrt
+from math import sqrt
 from typing import List, Tuple, Union
 
 # For nicer printing of results
@@ -50,14 +49,37 @@ FIGURATE_QUADRATIC_PARAMETERS = {
     8: (3.0, -2.0),  # Octagonal:   P[8,n] = n(3n−2)    = (3)   * n^2 - (2)   * n
 }
 
+# Exact integer formulae for various figurate numbers
+FIGURATE_FORMULAS = {
+    3: lambda n: n * (n + 1) // 2,      # Triangular:  P[3,n] = n(n+1)/2
+    4: lambda n: n * n,                 # Square:      P[4,n] = n^2
+    5: lambda n: n * (3 * n - 1) // 2,  # Pentagonal:  P[5,n] = n(3n−1)/2
+    6: lambda n: n * (2 * n - 1),       # Hexagonal:   P[6,n] = n(2n−1)
+    7: lambda n: n * (5 * n - 3) // 2,  # Heptagonal:  P[7,n] = n(5n−3)/2
+    8: lambda n: n * (3 * n - 2),       # Octagonal:   P[8,n] = n(3n−2)
+}
+
+# Ranges [n_min, n_max) of indices `n` for which P[m,n] is a 4-digit number
+#   i.e. n_min is the least `n` with P[m,n] >= 10^3, and n_max is the least `n` with P[m,n] >= 10^4
+FIGURATE_N_RANGES = {
+    3: (45, 141),  # Triangular:  P[3,45] = 1035, P[3,140] = 9870
+    4: (32, 100),  # Square:      P[4,32] = 1024, P[4,99]  = 9801
+    5: (26, 82),   # Pentagonal:  P[5,26] = 1001, P[5,81]  = 9801
+    6: (23, 71),   # Hexagonal:   P[6,23] = 1035, P[6,70]  = 9730
+    7: (21, 64),   # Heptagonal:  P[7,21] = 1071, P[7,63]  = 9828
+    8: (19, 59),   # Octagonal:   P[8,19] = 1045, P[8,58]  = 9976
+}
+
+# Single-bit flags for each polygon type, so that sets of types can be held in an integer bitmask
+FIGURATE_TYPE_BITS = {m: 1 << i for i, m in enumerate(FIGURATE_LABELS)}
+FIGURATE_BIT_TYPES = {bit: m for m, bit in FIGURATE_TYPE_BITS.items()}
 
-def quadratic_lower_limit(a: Union[float, int], b: Union[float, int], c: Union[float, int]) -> int:
+
+def quadratic_root(a: Union[float, int], b: Union[float, int], c: Union[float, int]) -> float:
     """
-    Given an inequality of the form:
-        a*x^2 + b*x + c >= 0,
-        return the integer lower bound (inclusive) for `x`,
-        using only the greater of the two quadratic roots,
-    NOTE: Assumes that the given formula has real roots.
+    Returns the greater of the two roots of the quadratic formula:
+        a*x^2 + b*x + c = 0
+    NOTE: Assumes that the given formula has real roots, and that `a` is positive.
 
     Args:
         a (float or int)
@@ -65,40 +87,26 @@ def quadratic_lower_limit(a: Union[float, int], b: Union[float, int], c: Union[f
         c (float or int)
 
     Returns:
-        (int): Integer lower bound (inclusive) for `x`, satisfying the quadratic inequality
-
-    Raises:
-        AssertError: if incorrect args are given
+        (float): Greater root of the quadratic formula
     """
-    assert type(a) in {float, int}
-    assert type(b) in {float, int}
-    assert type(c) in {float, int}
-    return ceil((-b + sqrt(b**2 - 4*a*c)) / (2*a))
+    return (-b + sqrt(b * b - 4 * a * c)) / (2 * a)
 
 
-def quadratic_upper_limit(a: Union[float, int], b: Union[float, int], c: Union[float, int]) -> int:
+def figurate_index(x: int, m: int) -> int:
     """
-    Given an inequality of the form:
-        a*x^2 + b*x + c < 0,
-        return the integer upper bound (exclusive) for `x`,
-        using only the greater of the two quadratic roots,
-    NOTE: Assumes that the given formula has real roots.
+    Given a figurate number `x` of polygon-type `m`,
+        return the index `n` of that number within the polygon-type's sequence,
+        by solving the polygon-type's quadratic formula for `n`.
 
     Args:
-        a (float or int): Integer
-        b (float or int): Integer
-        c (float or int): Integer
+        x (int): Figurate number
+        m (int): Polygon-type, represented as an integer in range [3, 8]
 
     Returns:
-        (int): Integer upper bound (exclusive) for `x`, satisfying the quadratic inequality
-
-    Raises:
-        AssertError: if incorrect args are given
+        (int): Index `n` such that P[m,n] = x
     """
-    assert type(a) in {float, int}
-    assert type(b) in {float, int}
-    assert type(c) in {float, int}
-    return floor((-b + sqrt(b ** 2 - 4 * a * c)) / (2 * a)) + 1
+    a, b = FIGURATE_QUADRATIC_PARAMETERS[m]
+    return round(quadratic_root(a, b, -x))
 
 
 def main() -> List[Tuple[int, int, int]]:
@@ -117,31 +125,45 @@ def main() -> List[Tuple[int, int, int]]:
               * The polygonal-type, represented as an integer in range [3, 8]
               * The index `n` of that number within the polygon-type's sequence
     """
-    global FIGURATE_QUADRATIC_PARAMETERS
-
     # First, collect all relevant figurate numbers
 
     # NOTE:
-    #     (1) Numbers stored in sets indexed by ...
+    #     (1) Numbers stored in lists indexed by ...
     #         * (int) Polygon-type as integer in range [3,8]
-    #         * (str) Beginning two digits
+    #         * (int) Beginning two digits
     #
-    #     (2) Numbers stored as tuples of ...
-    #         * The number itself
-    #         * The polygonal type, represented as an integer in range [3, 8]
-    #         * The index `n` of that number within that polygon-type's sequence
+    #     (2) Numbers stored as plain integers,
+    #           since the polygon-type is already known from where the number is stored,
+    #           and its index `n` is only needed for the final result
 
     figurate_numbers = dict()
-    x_lower_bound = 10 ** 3  # Lower bound (inclusive) of 4-digit numbers
-    x_upper_bound = 10 ** 4  # Upper bound (exclusive) of 4-digit numbers
-
-    for m, (a, b) in FIGURATE_QUADRATIC_PARAMETERS.items():
-        figurate_numbers[m] = defaultdict(lambda: set())
-        n_min = quadratic_lower_limit(a, b, -x_lower_bound)
-        n_max = quadratic_upper_limit(a, b, -x_upper_bound)
-        for n in range(n_min, n_max):
-            x = round(a * n ** 2 + b * n)
-            figurate_numbers[m][str(x)[:2]].add((x, m, n))
+    figurate_suffixes = dict()  # Bitsets of ending two digits present, indexed the same way as `figurate_numbers`
+
+    for m, (n_min, n_max) in FIGURATE_N_RANGES.items():
+        figurate_numbers[m] = [[] for _ in range(100)]
+        figurate_suffixes[m] = [0] * 100
+        xs = map(FIGURATE_FORMULAS[m], range(n_min, n_max))
+        for x in xs:
+            prefix, suffix = divmod(x, 100)
+            figurate_numbers[m][prefix].append(x)
+            figurate_suffixes[m][prefix] |= 1 << suffix
+
+    # Same tables, indexed by each polygon type's bit flag, for direct use with the search's bitmask
+    numbers_by_bit = {bit: figurate_numbers[m] for m, bit in FIGURATE_TYPE_BITS.items()}
+    suffixes_by_bit = {bit: figurate_suffixes[m] for m, bit in FIGURATE_TYPE_BITS.items()}
+
+    # All octagonal numbers, flattened once, for seeding the search
+    # Order them by how many numbers of other polygon types could follow them,
+    #   dropping those which no other number could follow, and trying the most promising first
+    seed_continuations = {
+        x: sum(len(figurate_numbers[m][x % 100]) for m in figurate_numbers if m != 8)
+        for bucket in figurate_numbers[8]
+        for x in bucket
+    }
+    seed_choices = sorted(
+        (x for x, count in seed_continuations.items() if count > 0),
+        key=lambda x: -seed_continuations[x],
+    )
 
     # Idea:
     #     Depth-first search through possible sequences,
@@ -151,44 +173,73 @@ def main() -> List[Tuple[int, int, int]]:
     #       * looking for appropriate starting digits (to remain cyclical), and
     #       * polygons not yet used in current sequence (to use up all polygon types)
 
-    # Local variables to be updated by recursive search
-    curr_seq = []
-    remaining_polygon_types = set(range(3, 9))
-
-    # Recursive function to execute search
+    # Local variables to be updated by search
+    curr_seq = []  # Pairs of (number, polygon-type)
+    dead_ends = set()  # States of (remaining types, required beginning digits, closing digits) known to fail
+
+    # Number of elements in a complete sequence
+    seq_length = len(figurate_numbers)
+
+    # Function to list the continuations from numbers of the polygon types in bitmask `remaining`,
+    #   which begin with the digits `prefix`, as pairs of (number, polygon-type bit)
+    def continuations(remaining, prefix):
+        # Collect the continuations available from each remaining polygon type
+        candidates = []
+        bits = remaining
+        while bits:
+            bit = bits & -bits  # Lowest remaining bit
+            bits ^= bit
+            choices = numbers_by_bit[bit][prefix]
+            if choices:
+                candidates.append((len(choices), bit, choices))
+
+        # Branch on the polygon types with the fewest continuations first
+        candidates.sort()
+        return ((x, bit) for _, bit, choices in candidates for x in choices)
+
+    # Function to execute the search, trying each octagonal number as the first element
+    # Uses an explicit stack of frames, one per element in `curr_seq`,
+    #   each holding the search state after that element and an iterator over its untried continuations
     def search_seqs():
-        if len(curr_seq) == len(figurate_numbers):
-            # Sequence has been constructed with all previous reqs satisfied
-            # Check the last req: whether sequence is fully circular
-            return str(curr_seq[-1][0])[2:] == str(curr_seq[0][0])[:2]
-        else:
-            # Need to add an element to the sequence
-            # If starting with empty sequence, try seeding with all octagonal numbers
-            ts = {8} if len(curr_seq) == 0 else remaining_polygon_types
-            for t in ts:
-                if len(curr_seq) == 0:
-                    choices = set.union(*figurate_numbers[t].values())
+        seed_remaining = sum(FIGURATE_TYPE_BITS.values()) ^ FIGURATE_TYPE_BITS[8]
+        for first in seed_choices:
+            closing_suffix = first // 100
+            curr_seq.append((first, 8))
+            stack = [((seed_remaining, first % 100, closing_suffix), continuations(seed_remaining, first % 100))]
+            while stack:
+                state, choices = stack[-1]
+                choice = next(choices, None)
+                if choice is None:
+                    # Nothing worked with `curr_seq`, so remember that and step back
+                    dead_ends.add(state)
+                    stack.pop()
+                    curr_seq.pop()
+                    continue
+
+                x, bit = choice
+                curr_seq.append((x, FIGURATE_BIT_TYPES[bit]))
+                remaining = state[0] ^ bit
+                suffix = x % 100
+                if len(curr_seq) == seq_length - 1:
+                    # Only one polygon type remains, and its number must also close the cycle
+                    #   by ending with the first element's beginning digits,
+                    #   so the only possible number is fully determined by those digits
+                    if suffixes_by_bit[remaining][suffix] >> closing_suffix & 1:
+                        curr_seq.append((suffix * 100 + closing_suffix, FIGURATE_BIT_TYPES[remaining]))
+                        return True  # Found the fully circular sequence
+                    curr_seq.pop()  # Didn't work with this choice, so remove and continue
                 else:
-                    choices = figurate_numbers[t][str(curr_seq[-1][0])[2:]]
-
-                remaining_polygon_types.discard(t)
-                for choice in choices:
-                    curr_seq.append(choice)
-                    if search_seqs():
-                        return True  # Found a good sequence, so leave it alone and exit search
+                    next_state = (remaining, suffix, closing_suffix)
+                    if next_state in dead_ends:
+                        curr_seq.pop()  # Already known not to work, so remove and continue
                     else:
-                        curr_seq.pop()  # Didn't work with this choice, so remove and continue
-
-                # Didn't find any working choice of type `t`, so continue
-                remaining_polygon_types.add(t)
-
-            # Nothing worked with `curr_seq`, so step back
-            return False
+                        stack.append((next_state, continuations(remaining, suffix)))
+        return False
 
     # Execute the search
     assert search_seqs()
 
-    return curr_seq
+    return [(x, m, figurate_index(x, m)) for x, m in curr_seq]
 
 
 if __name__ == '__main__':